@@ -19,41 +19,88 @@ Dependencies:
     - python-dotenv>=0.19.0
 
 Usage:
-    from modules.azure_client import AzureClient
+    from modules.azure_client import AzureClient, get_azure_client
     
     client = AzureClient()
+    openai_client = get_azure_client()
 """
 import os
-from azure.identity import ClientSecretCredential
-from openai import AzureOpenAI
+from azure.identity import ClientSecretCredential, get_bearer_token_provider
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
+import streamlit as st
 import logging
 
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
+
+TOKEN_SCOPE = "https://cognitiveservices.azure.com/.default"
+
 class AzureClient:
-    def setup_azure_client(self):
-        """Set up and return Azure OpenAI client"""
-        try:
+    _token_provider = None
+
+    def get_token_provider(self):
+        """
+        Return a callable yielding a current AAD access token. The provider caches the token and
+        refreshes it before it expires, so clients built with it never send a stale token.
+        """
+        if AzureClient._token_provider is None:
             load_dotenv()
             credential = ClientSecretCredential(
                 tenant_id=os.environ.get("SP_TENANT_ID"),
                 client_id=os.environ.get("SP_CLIENT_ID"),
                 client_secret=os.environ.get("SP_CLIENT_SECRET")
             )
-            token = credential.get_token("https://cognitiveservices.azure.com/.default").token
+            AzureClient._token_provider = get_bearer_token_provider(credential, TOKEN_SCOPE)
+        return AzureClient._token_provider
+
+    def setup_azure_client(self):
+        """Set up and return Azure OpenAI client; raises if it cannot be created"""
+        try:
+            token_provider = self.get_token_provider()
 
             # Set required environment variables
             os.environ["OPENAI_API_VERSION"] = "2023-05-15"
             os.environ["OPENAI_API_TYPE"] = "azure_ad"
-            os.environ["AZURE_OPENAI_API_KEY"] = token
             
             return AzureOpenAI(
-                api_key=token,
+                azure_ad_token_provider=token_provider,
                 azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
                 api_version="2023-05-15"
             )
         except Exception as e:
             logger.error(f"Failed to setup Azure client: {str(e)}")
+            raise
+
+    def setup_async_azure_client(self):
+        """
+        Set up and return an async Azure OpenAI client for issuing requests concurrently.
+        Its HTTP pool is bound to the event loop that uses it, so create one per asyncio.run
+        instead of caching it; the token provider (and its cached token) is still shared.
+        """
+        try:
+            return AsyncAzureOpenAI(
+                azure_ad_token_provider=self.get_token_provider(),
+                azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
+                api_version="2023-05-15"
+            )
+        except Exception as e:
+            logger.error(f"Failed to setup async Azure client: {str(e)}")
             return None
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_azure_client():
+    """
+    Azure OpenAI client shared across Streamlit reruns and sessions. It fetches tokens through the
+    token provider, so it stays valid indefinitely; failures raise and are therefore not cached.
+    """
+    return AzureClient().setup_azure_client()
+
+def get_azure_client():
+    """Shared Azure OpenAI client, or None when it cannot be created (retried on the next call)"""
+    try:
+        return _shared_azure_client()
+    except Exception:
+        return None
@@ -22,26 +22,50 @@ Usage:
     from modules import AzureClient,os, logging
 """
 import streamlit as st
-from modules.azure_client import AzureClient
+from modules.azure_client import get_azure_client
 import logging
+import hashlib
 import os
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# The combined reply carries the question (100 tokens before) and the review (500) in one
+# completion, with some headroom so long reviews are not cut off
+COMBINED_REVIEW_MAX_TOKENS = 1000
+RESEARCH_QUESTION_PREFIX = "Research question:"
+NO_RESEARCH_QUESTION = "No research question found"
+NO_QUESTION_RESULT = {
+    "research_question": "Could not extract research question.",
+    "review": "Cannot perform a critical review without a valid research question."
+}
+
 class CriticalAnalyzer:
-    def __init__(self):
-        """Initialize the CriticalAnalyzer with Azure client"""
-        self.azure_client = AzureClient()
-        self.client = self.azure_client.setup_azure_client()
+    def __init__(self, client=None):
+        """Initialize the CriticalAnalyzer with an Azure OpenAI client, defaulting to the shared cached one"""
+        self.client = client if client is not None else get_azure_client()
 
     def get_completion(self, messages, temperature=0.7, max_tokens=8000):
         """Get completion from Azure OpenAI"""
-        if not self.client:
+        return self._complete(self.client, messages, temperature, max_tokens, self._model_name())
+
+    @staticmethod
+    def _model_name() -> str:
+        return os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-35-turbo")
+
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        """Cache key for manuscript text so the full text is not hashed by st.cache_data"""
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    @staticmethod
+    def _complete(client, messages, temperature: float, max_tokens: int, model_name: str) -> str:
+        """Send a chat completion request and return the stripped response text"""
+        if not client:
             raise ValueError("Azure OpenAI client not initialized")
         try:
-            response = self.client.chat.completions.create(
-                model=os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-35-turbo"),
+            response = client.chat.completions.create(
+                model=model_name,
                 messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens
@@ -51,19 +75,165 @@ class CriticalAnalyzer:
             logger.error(f"Error in getting completion: {str(e)}")
             raise
 
+    @staticmethod
+    @st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+    def _cached_research_question(_client, _text: str, content_hash: str, temperature: float,
+                                  max_tokens: int, model_name: str) -> str:
+        """Cached research question extraction, keyed on the text hash. Errors propagate so they are not cached."""
+        prompt = f"""
+        You are a PhD-level researcher in epidemiology. Extract the main research question from the following text.
+        If there is no explicit question, please infer the most likely research question based on the content.
+        Text: {_text}
+        """
+        messages = [
+            {"role": "system", "content": "You are a PhD level science research expert."},
+            {"role": "user", "content": prompt},
+        ]
+        return CriticalAnalyzer._complete(_client, messages, temperature, max_tokens, model_name)
+
+    @staticmethod
+    @st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+    def _cached_critical_review(_client, _text: str, content_hash: str, research_question: str,
+                                temperature: float, max_tokens: int, model_name: str) -> str:
+        """Cached methodology review, keyed on the text hash. Errors propagate so they are not cached."""
+        messages = CriticalAnalyzer._critical_review_messages(_text, research_question)
+        return CriticalAnalyzer._complete(_client, messages, temperature, max_tokens, model_name)
+
+    @staticmethod
+    def _critical_review_messages(text: str, research_question: str) -> list:
+        """Chat messages asking for a critical review of the methodology"""
+        prompt = f"""
+        You are a PhD-level statistician or econometrician. Critically evaluate the methodology of
+        the following paper {text} in the context of the research question {research_question}.
+        The content might fall under an explicitly described methods section or be randomly placed in the text.
+        Provide a detailed review that includes:
+        - The appropriateness of the method to answer the research question
+        - Any limitations or potential biases of the methods used
+        - Suggestions for improving methodology
+        - Recommendations for alternative approaches if applicable
+        """
+        return [
+            {"role": "system", "content": "You are a PhD statistician/econometrician."},
+            {"role": "user", "content": prompt},
+        ]
+
+    @staticmethod
+    def _stream_completion(client, messages, temperature: float, max_tokens: int, model_name: str):
+        """Yield the completion text piece by piece as Azure OpenAI generates it"""
+        if not client:
+            raise ValueError("Azure OpenAI client not initialized")
+        try:
+            response = client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for chunk in response:
+                # Azure sends a leading chunk with no choices (content filter results)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            logger.error(f"Error in streaming completion: {str(e)}")
+            raise
+
+    @staticmethod
+    def _methods_review_messages(text: str) -> list:
+        """
+        Chat messages asking for the research question and the methodology review in one reply.
+        The question comes first, on its own line, so it can be read before the review finishes streaming.
+        """
+        prompt = f"""
+        You are a PhD-level epidemiologist and statistician. For the following paper, first extract the main
+        research question; if there is no explicit question, infer the most likely one from the content.
+        Then critically evaluate the methodology of the paper in the context of that research question.
+        The content might fall under an explicitly described methods section or be randomly placed in the text.
+        The review should include:
+        - The appropriateness of the method to answer the research question
+        - Any limitations or potential biases of the methods used
+        - Suggestions for improving methodology
+        - Recommendations for alternative approaches if applicable
+        Start your reply with a single line of the form "{RESEARCH_QUESTION_PREFIX} <the research question>",
+        followed by a blank line and then the review. If the text has no research question at all, reply
+        only with "{RESEARCH_QUESTION_PREFIX} {NO_RESEARCH_QUESTION}".
+        Text: {text}
+        """
+        return [
+            {"role": "system", "content": "You are a PhD level science research expert and statistician/econometrician."},
+            {"role": "user", "content": prompt},
+        ]
+
+    @staticmethod
+    def _split_methods_review(chunks):
+        """
+        Read a streamed combined reply up to the end of its first non-blank line.
+        Returns (research_question, generator of the rest of the reply, i.e. the review); research_question
+        is None when that line does not carry the RESEARCH_QUESTION_PREFIX label.
+        """
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk
+            if "\n" in buffer.lstrip():
+                break
+        first_line, _, rest = buffer.lstrip().partition("\n")
+        # Tolerate markdown around the label, e.g. "**Research question:** ..." or "## Research question: ..."
+        label = first_line.strip().lstrip("*#_ \t")
+        if label.lower().startswith(RESEARCH_QUESTION_PREFIX.lower()):
+            research_question = label[len(RESEARCH_QUESTION_PREFIX):].strip("*_ \t")
+        else:
+            research_question = None
+
+        def review():
+            # Skip the blank line(s) between the question and the review
+            pending = rest.lstrip()
+            while not pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending = chunk.lstrip()
+            yield pending
+            yield from chunks
+
+        return research_question, review()
+
+    @staticmethod
+    def _has_research_question(research_question: str) -> bool:
+        return bool(research_question) and research_question.lower().rstrip(".") != NO_RESEARCH_QUESTION.lower()
+
+    @staticmethod
+    @st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+    def _cached_analyze_methods(_client, _text: str, content_hash: str, temperature: float, model_name: str) -> dict:
+        """Cached research question + review pair for a manuscript, fetched in a single completion when possible"""
+        chunks = CriticalAnalyzer._stream_completion(
+            _client, CriticalAnalyzer._methods_review_messages(_text), temperature, COMBINED_REVIEW_MAX_TOKENS, model_name)
+        research_question, review = CriticalAnalyzer._split_methods_review(chunks)
+        if research_question is None:
+            chunks.close()
+            logger.info("Combined methods review unusable, falling back to separate requests")
+            research_question = CriticalAnalyzer._cached_research_question(
+                _client, _text, content_hash, temperature, 100, model_name)
+            if not CriticalAnalyzer._has_research_question(research_question):
+                return NO_QUESTION_RESULT
+            review = CriticalAnalyzer._cached_critical_review(
+                _client, _text, content_hash, research_question, temperature, 500, model_name)
+            return {
+                "research_question": research_question,
+                "review": review
+            }
+        if not CriticalAnalyzer._has_research_question(research_question):
+            chunks.close()
+            return NO_QUESTION_RESULT
+        return {
+            "research_question": research_question,
+            "review": "".join(review).strip()
+        }
+
     def extract_research_question(self, text: str, temperature: float = 0.7, max_tokens: int = 100) -> str:
         """Extract research question from text using Azure OpenAI"""
         try:
-            prompt = f"""
-            You are a PhD-level researcher in epidemiology. Extract the main research question from the following text.
-            If there is no explicit question, please infer the most likely research question based on the content.
-            Text: {text}
-            """
-            messages = [
-                {"role": "system", "content": "You are a PhD level science research expert."},
-                {"role": "user", "content": prompt},
-            ]
-            return self.get_completion(messages, temperature=temperature, max_tokens=max_tokens)
+            return self._cached_research_question(self.client, text, self._content_hash(text),
+                                                  temperature, max_tokens, self._model_name())
         except Exception as e:
             logger.error(f"Error in extracting research question: {str(e)}")
             return "Failed to extract research question."
@@ -72,44 +242,43 @@ class CriticalAnalyzer:
                        temperature: float = 0.7, max_tokens: int = 500) -> str:
         """Perform critical review of methodology"""
         try:
-            prompt = f"""
-            You are a PhD-level statistician or econometrician. Critically evaluate the methodology of
-            the following paper {text} in the context of the research question {research_question}.
-            The content might fall under an explicitly described methods section or be randomly placed in the text.
-            Provide a detailed review that includes:
-            - The appropriateness of the method to answer the research question
-            - Any limitations or potential biases of the methods used
-            - Suggestions for improving methodology
-            - Recommendations for alternative approaches if applicable
-            """
-            messages = [
-                {"role": "system", "content": "You are a PhD statistician/econometrician."},
-                {"role": "user", "content": prompt},
-            ]
-            return self.get_completion(messages, temperature=temperature, max_tokens=max_tokens)
+            return self._cached_critical_review(self.client, text, self._content_hash(text), research_question,
+                                                temperature, max_tokens, self._model_name())
         except Exception as e:
             logger.error(f"Error in critical review generation: {str(e)}")
             return "Failed to conduct critical review. Recheck manuscript length and paste methods only."
 
-
-    def analyze_methods(self, text: str) -> dict:
+    def analyze_methods_stream(self, text: str, temperature: float = 0.7):
+        """
+        Methodology analysis from a single streamed completion, for rendering the review with st.write_stream.
+        Returns (research_question, review_stream); review_stream is None when no research question was found,
+        and research_question is then the message to show instead.
+        Request errors propagate to the caller.
+        """
+        chunks = self._stream_completion(self.client, self._methods_review_messages(text),
+                                         temperature, COMBINED_REVIEW_MAX_TOKENS, self._model_name())
+        research_question, review = self._split_methods_review(chunks)
+        if research_question is None:
+            # The reply ignored the format; ask for the question, then stream the review separately
+            chunks.close()
+            logger.info("Combined methods review unusable, falling back to separate requests")
+            research_question = self._cached_research_question(self.client, text, self._content_hash(text),
+                                                               temperature, 100, self._model_name())
+            if not self._has_research_question(research_question):
+                return NO_QUESTION_RESULT["research_question"], None
+            review = self._stream_completion(self.client, self._critical_review_messages(text, research_question),
+                                             temperature, 500, self._model_name())
+            return research_question, review
+        if not self._has_research_question(research_question):
+            chunks.close()
+            return NO_QUESTION_RESULT["research_question"], None
+        return research_question, review
+
+    def analyze_methods(self, text: str, temperature: float = 0.7) -> dict:
         """Complete method analysis including research question extraction and review"""
         try:
-            logger.info("Trying to extract research question")
-            research_question = self.extract_research_question(text)
-            logger.info("Extracted research question")
-            
-            if not research_question or research_question.lower() == "no research question found":
-                return {
-                    "research_question": "Could not extract research question.",
-                    "review": "Cannot perform a critical review without a valid research question."
-                }
-                
-            review = self.critical_review(text, research_question)
-            return {
-                "research_question": research_question,
-                "review": review
-            }
+            return self._cached_analyze_methods(self.client, text, self._content_hash(text),
+                                                temperature, self._model_name())
         except Exception as e:
             logger.error(f"Error in analyzing methods: {str(e)}")
             return {
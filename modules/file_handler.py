@@ -19,6 +19,7 @@ Supported File Formats:
 
 Dependencies:
     - python-docx>=0.8.11
+    - PyMuPDF
 
 Usage:
     from modules.file_handling import FileHandler
@@ -28,32 +29,135 @@ Usage:
     handler.save_file('output.txt', content)
 """
 
-from docx import Document
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import PyPDF2
-import docx
+# python-docx, reportlab, PyMuPDF and PyPDF2 are imported where each format is handled,
+# so the app's cold start only pays for the formats that are actually used
 import io
+import os
+import re
+import bisect
+import hashlib
+import streamlit as st
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Union
 import logging
+import multiprocessing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+# PDF export layout, in points
+PDF_FONT = "Helvetica"
+PDF_FONT_SIZE = 12
+PDF_LEADING = 14
+PDF_LEFT = 40
+PDF_TOP = 750
+PDF_BOTTOM_MARGIN = 40
+PDF_PAGE_WIDTH = 612  # US letter, reportlab.lib.pagesizes.letter[0]
+PDF_TEXT_WIDTH = PDF_PAGE_WIDTH - 2 * PDF_LEFT
+
+# WordprocessingML tags read when extracting .docx text
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DOCX_PARAGRAPH = f'{_W_NS}p'
+DOCX_RUN = f'{_W_NS}r'
+DOCX_HYPERLINK = f'{_W_NS}hyperlink'
+DOCX_TEXT = f'{_W_NS}t'
+DOCX_BREAK_TYPE = f'{_W_NS}type'
+# Text equivalents of a run's other inner-content elements, as in python-docx's Run.text
+DOCX_RUN_SYMBOLS = {
+    f'{_W_NS}tab': '\t',
+    f'{_W_NS}ptab': '\t',
+    f'{_W_NS}cr': '\n',
+    f'{_W_NS}noBreakHyphen': '-',
+}
+DOCX_BREAK = f'{_W_NS}br'
+
+# Opt-in because process pools can oversubscribe CPUs on shared Streamlit hosts
+PARALLEL_PDF_EXTRACTION = os.environ.get("PARALLEL_PDF_EXTRACTION", "").lower() in ("1", "true", "yes")
+PARALLEL_PDF_MIN_PAGES = 16
+
+def _docx_run_text(run) -> str:
+    """Text of a <w:r> element; only text-wrapping breaks count as newlines, page and column breaks as nothing"""
+    parts = []
+    for node in run.iterchildren(DOCX_TEXT, DOCX_BREAK, *DOCX_RUN_SYMBOLS):
+        if node.tag == DOCX_TEXT:
+            parts.append(node.text or '')
+        elif node.tag == DOCX_BREAK:
+            if node.get(DOCX_BREAK_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        else:
+            parts.append(DOCX_RUN_SYMBOLS[node.tag])
+    return ''.join(parts)
+
+def _docx_paragraph_text(paragraph) -> str:
+    """
+    Text of a <w:p> element from its own runs and hyperlink runs only, matching Paragraph.text;
+    text boxes and other content nested deeper in the runs is left out
+    """
+    return ''.join(
+        _docx_run_text(run)
+        for child in paragraph.iterchildren(DOCX_RUN, DOCX_HYPERLINK)
+        for run in (child.iterchildren(DOCX_RUN) if child.tag == DOCX_HYPERLINK else (child,))
+    )
+
+def _extract_pdf_pages(data: bytes, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of a PDF; module level so worker processes can unpickle it"""
+    import fitz
+    with fitz.open(stream=data, filetype="pdf") as pdf_doc:
+        return [pdf_doc[i].get_text("text") for i in range(start, stop)]
+
 class FileHandler:
 
+    @staticmethod
+    def _read_pdf_pymupdf(data: bytes) -> str:
+        """
+        Extract the text of every page of a PDF with PyMuPDF. PyMuPDF documents cannot be shared
+        between threads, so when PARALLEL_PDF_EXTRACTION is enabled large PDFs are split into page
+        ranges that worker processes open and extract independently.
+        """
+        import fitz
+        with fitz.open(stream=data, filetype="pdf") as pdf_doc:
+            page_count = pdf_doc.page_count
+            if not PARALLEL_PDF_EXTRACTION or page_count < PARALLEL_PDF_MIN_PAGES:
+                return '\n'.join(page.get_text("text") for page in pdf_doc)
+
+        workers = min(8, os.cpu_count() or 1)
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        # Spawn rather than fork: forking the multi-threaded Streamlit server can deadlock the
+        # child on a lock held by another thread
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            chunks = executor.map(_extract_pdf_pages, [data] * len(ranges), *zip(*ranges))
+            return '\n'.join(text for chunk in chunks for text in chunk)
+
     def read_file(self, file):
         """Read text from uploaded file"""
         try:
             file_type = file.name.split('.')[-1].lower()
             
             if file_type == 'txt':
-                return file.getvalue().decode('utf-8')
+                # Decode from the upload buffer; newline='' keeps \r\n and \r line endings as uploaded
+                file.seek(0)
+                wrapper = io.TextIOWrapper(file, encoding='utf-8', newline='')
+                try:
+                    return wrapper.read()
+                finally:
+                    # Detach so closing the wrapper does not close the uploaded file
+                    wrapper.detach()
             elif file_type == 'docx':
-                doc = Document(file)
-                return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
+                from docx import Document
+                # Walk the body XML directly; building Paragraph and Run wrappers dominates large reads
+                body = Document(file).element.body
+                return '\n'.join(_docx_paragraph_text(paragraph) for paragraph in body.iterchildren(DOCX_PARAGRAPH))
             elif file_type == 'pdf':
-                pdf_reader = PyPDF2.PdfReader(file)
-                return '\n'.join(page.extract_text() for page in pdf_reader.pages)
+                try:
+                    return self._read_pdf_pymupdf(file.getvalue())
+                except Exception as e:
+                    # PyPDF2 is slower but tolerates some files PyMuPDF rejects
+                    logger.warning(f"PyMuPDF failed to read PDF, falling back to PyPDF2: {str(e)}")
+                    import PyPDF2
+                    file.seek(0)
+                    pdf_reader = PyPDF2.PdfReader(file)
+                    return '\n'.join(page.extract_text() for page in pdf_reader.pages)
             return None
         except Exception as e:
             logger.error(f"Error in reading file: {str(e)}")
@@ -67,6 +171,15 @@ class FileHandler:
         """
         if not isinstance(changes, list):
             raise ValueError(f"Changes must be a list, got {type(changes)}")
+        # Fast path: bulk-extract the fields and only walk the list again to report an error
+        try:
+            positions = [change["position"] for change in changes]
+            texts = [change["text"] for change in changes]
+            if all(type(position) is int for position in positions) and all(type(text) is str for text in texts):
+                return True
+        except (TypeError, KeyError, IndexError):
+            pass
+
         for i, change in enumerate(changes):
             if not isinstance(change, dict):
                 raise ValueError(f"Change at index {i} must be a dictionary, got {type(change)}")
@@ -98,6 +211,93 @@ class FileHandler:
 
                         
 
+    @staticmethod
+    @st.cache_data(max_entries=4, show_spinner=False)
+    def _cached_document_bytes(_text: str, text_hash: str, format_type: str, _changes: List, changes_hash: str) -> bytes:
+        """Cached export keyed on hashes of the text and changes, so reruns don't rebuild the file"""
+        # st.download_button copies whatever it is given into memory, so the bytes are cached directly
+        return FileHandler().save_edited_document(_text, format_type, _changes).getvalue()
+
+    def export_document(self, text: str, format_type: str, changes: List = None) -> bytes:
+        """
+        Build the document bytes for download, reusing the last export of the same text and changes
+        Args:
+            text: Content to save
+            format_type: Output format ('docx' or 'pdf')
+            changes: List of changes (either from highlight_differences or in dictionary format)
+
+        Returns:
+            bytes: Document in specified format
+        """
+        text_hash = hashlib.sha1(text.encode()).hexdigest()
+        changes_hash = hashlib.sha1(repr(changes).encode()).hexdigest()
+        return self._cached_document_bytes(text, text_hash, format_type, changes, changes_hash)
+
+    @staticmethod
+    def _make_docx_run(text: str, highlight: bool = False):
+        """Build a <w:r> element directly, skipping python-docx's Run wrapper"""
+        from docx.oxml import OxmlElement
+        from docx.oxml.ns import qn
+        run = OxmlElement('w:r')
+        if highlight:
+            run_properties = OxmlElement('w:rPr')
+            color = OxmlElement('w:color')
+            color.set(qn('w:val'), 'FF0000')
+            run_properties.append(color)
+            run.append(run_properties)
+        text_element = OxmlElement('w:t')
+        text_element.text = text
+        text_element.set(qn('xml:space'), 'preserve')
+        run.append(text_element)
+        return run
+
+    @staticmethod
+    def _add_docx_runs(paragraph_runs: List[List], line_starts: List[int], position: int, segment: str, highlight: bool = False):
+        """
+        Add a segment of the text starting at character offset `position` as run elements,
+        one per line it spans, to the pending runs of the paragraphs for those lines
+        """
+        if not paragraph_runs:
+            return
+        index = bisect.bisect_right(line_starts, position) - 1
+        last = len(paragraph_runs) - 1
+        for offset, line in enumerate(segment.split('\n')):
+            if line:
+                paragraph_runs[min(max(index + offset, 0), last)].append(
+                    FileHandler._make_docx_run(line, highlight))
+
+    @staticmethod
+    def _begin_pdf_page(c):
+        """Start a text object at the top of the current PDF page"""
+        text_object = c.beginText(PDF_LEFT, PDF_TOP)
+        text_object.setFont(PDF_FONT, PDF_FONT_SIZE, leading=PDF_LEADING)
+        return text_object
+
+    @staticmethod
+    def _emit_lines(c, text_object, lines: List[str], color: str, state: Dict):
+        """
+        Write lines to the PDF, wrapping long lines to the page width and starting a new page
+        when the cursor reaches the bottom margin. `state` tracks the cursor y position and the
+        current fill colour so it is only set when it changes.
+
+        Returns the text object to keep writing to, which is replaced after a page break.
+        """
+        from reportlab.lib.utils import simpleSplit
+        for line in lines:
+            for wrapped_line in simpleSplit(line, PDF_FONT, PDF_FONT_SIZE, PDF_TEXT_WIDTH) or ['']:
+                if state['y'] < PDF_BOTTOM_MARGIN:
+                    c.drawText(text_object)
+                    c.showPage()
+                    text_object = FileHandler._begin_pdf_page(c)
+                    state['y'] = PDF_TOP
+                    state['color'] = None
+                if color != state['color']:
+                    text_object.setFillColor(color)
+                    state['color'] = color
+                text_object.textLine(wrapped_line)
+                state['y'] -= PDF_LEADING
+        return text_object
+
     def save_edited_document(self, text: str, format_type: str, changes: List = None) -> io.BytesIO:
         """
         Save document in a specified format with highlighted changes
@@ -122,57 +322,36 @@ class FileHandler:
                 changes = formatted_changes
 
             if format_type == "docx":
+                from docx import Document
                 doc = Document()
-                current_paragraph = None
-                current_pos = 0
+                # Document.add_paragraph scans the body for its insertion point on every call, which is
+                # quadratic for long documents; inserting before a trailing sentinel paragraph is O(1)
+                sentinel = doc.add_paragraph()
+
+                # One paragraph per line of the text, created up front; a trailing newline adds no paragraph
+                line_starts = [0] + [match.end() for match in re.finditer('\n', text)]
+                if line_starts[-1] == len(text):
+                    line_starts.pop()
+                paragraphs = [sentinel.insert_paragraph_before() for _ in line_starts]
+                # Run elements are collected per paragraph and attached in one extend at the end
+                paragraph_runs = [[] for _ in paragraphs]
 
-                if changes:
-                    sorted_changes = sorted(changes, key=lambda x: x['position'])
-                    
-                    for change in sorted_changes:
-                        # Add unchanged text before the change
-                        if current_pos < change['position']:
-                            text_segment = text[current_pos:change['position']]
-                            # Only split if there's an actual newline in the text
-                            segments = text_segment.split('\n')
-                            
-                            for i, segment in enumerate(segments):
-                                if segment or i < len(segments) - 1:  # Add empty paragraphs only if they're explicit newlines
-                                    if current_paragraph is None or i > 0:
-                                        current_paragraph = doc.add_paragraph()
-                                    if segment:
-                                        current_paragraph.add_run(segment)
-                        
-                        # Add the changed text
-                        changed_segments = change['text'].split('\n')
-                        for i, segment in enumerate(changed_segments):
-                            if segment or i < len(changed_segments) - 1:  # Add empty paragraphs only if they're explicit newlines
-                                if current_paragraph is None or i > 0:
-                                    current_paragraph = doc.add_paragraph()
-                                if segment:
-                                    run = current_paragraph.add_run(segment)
-                                    run.font.color.rgb = docx.shared.RGBColor(255, 0, 0)
-                        
-                        current_pos = change['position'] + len(change['text'])
-                    
-                    # Add remaining text
-                    if current_pos < len(text):
-                        remaining_text = text[current_pos:]
-                        segments = remaining_text.split('\n')
-                        for i, segment in enumerate(segments):
-                            if segment or i < len(segments) - 1:  # Add empty paragraphs only if they're explicit newlines
-                                if current_paragraph is None or i > 0:
-                                    current_paragraph = doc.add_paragraph()
-                                if segment:
-                                    current_paragraph.add_run(segment)
-                else:
-                    # No changes - just add the text normally
-                    segments = text.split('\n')
-                    for i, segment in enumerate(segments):
-                        if segment or i < len(segments) - 1:  # Add empty paragraphs only if they're explicit newlines
-                            current_paragraph = doc.add_paragraph()
-                            if segment:
-                                current_paragraph.add_run(segment)
+                current_pos = 0
+                for change in sorted(changes or [], key=lambda x: x['position']):
+                    # Add unchanged text before the change
+                    if current_pos < change['position']:
+                        self._add_docx_runs(paragraph_runs, line_starts, current_pos, text[current_pos:change['position']])
+                    # Add the changed text
+                    self._add_docx_runs(paragraph_runs, line_starts, change['position'], change['text'], highlight=True)
+                    current_pos = change['position'] + len(change['text'])
+
+                # Add remaining text
+                if current_pos < len(text):
+                    self._add_docx_runs(paragraph_runs, line_starts, current_pos, text[current_pos:])
+
+                for paragraph, runs in zip(paragraphs, paragraph_runs):
+                    paragraph._p.extend(runs)
+                sentinel._element.getparent().remove(sentinel._element)
 
                 doc_io = io.BytesIO()
                 doc.save(doc_io)
@@ -180,43 +359,30 @@ class FileHandler:
                 return doc_io
 
             elif format_type == 'pdf':
+                from reportlab.pdfgen import canvas
+                from reportlab.lib.pagesizes import letter
                 pdf_io = io.BytesIO()
                 c = canvas.Canvas(pdf_io, pagesize=letter)
-                text_object = c.beginText(40, 750)
-                text_object.setFont("Helvetica", 12)
+                text_object = self._begin_pdf_page(c)
+                state = {'y': PDF_TOP, 'color': None}
                 
-                if changes:
-                    current_pos = 0
-                    sorted_changes = sorted(changes, key=lambda x: x['position'])
-                    
-                    for change in sorted_changes:
-                        # Add unchanged text
-                        if current_pos < change['position']:
-                            text_segment = text[current_pos:change['position']]
-                            text_object.setFillColor('black')
-                            lines = text_segment.rstrip('\n').split('\n')
-                            for line in lines:
-                                text_object.textLine(line)
-                        
-                        # Add changed text
-                        text_object.setFillColor('red')
-                        changed_lines = change['text'].rstrip('\n').split('\n')
-                        for line in changed_lines:
-                            text_object.textLine(line)
-                                
-                        current_pos = change['position'] + len(change['text'])
+                current_pos = 0
+                for change in sorted(changes or [], key=lambda x: x['position']):
+                    # Add unchanged text
+                    if current_pos < change['position']:
+                        lines = text[current_pos:change['position']].rstrip('\n').split('\n')
+                        text_object = self._emit_lines(c, text_object, lines, 'black', state)
                     
-                    # Add remaining text
-                    if current_pos < len(text):
-                        text_object.setFillColor('black')
-                        remaining_lines = text[current_pos:].rstrip('\n').split('\n')
-                        for line in remaining_lines:
-                            text_object.textLine(line)
-                else:
-                    # No changes - just add the text normally
-                    lines = text.rstrip('\n').split('\n')
-                    for line in lines:
-                        text_object.textLine(line)
+                    # Add changed text
+                    changed_lines = change['text'].rstrip('\n').split('\n')
+                    text_object = self._emit_lines(c, text_object, changed_lines, 'red', state)
+                            
+                    current_pos = change['position'] + len(change['text'])
+                
+                # Add remaining text (all of it when there are no changes)
+                if current_pos < len(text) or not changes:
+                    remaining_lines = text[current_pos:].rstrip('\n').split('\n')
+                    text_object = self._emit_lines(c, text_object, remaining_lines, 'black', state)
 
                 c.drawText(text_object)
                 c.save()
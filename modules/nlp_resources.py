@@ -0,0 +1,28 @@
+"""
+NLP Resources Module
+------------------
+Loads language resources shared by the analysis modules once, at import time,
+so individual renders do not rebuild them.
+
+Author: Walter Ochieng
+Email: ocu9@cdc.gov
+Version: 1.0.0
+Date: 2025-01-21
+License: MIT
+
+Resources:
+    - STOP_EN_FROZEN: NLTK English stopwords as a frozenset
+
+Dependencies:
+    - nltk>=3.6.0
+
+Usage:
+    from modules.nlp_resources import STOP_EN_FROZEN
+"""
+from modules.utils import Utils
+
+Utils.ensure_nltk_data('corpora/stopwords', 'stopwords')
+
+from nltk.corpus import stopwords
+
+STOP_EN_FROZEN = frozenset(stopwords.words('english'))
@@ -20,8 +20,10 @@ Features:
 
 Dependencies:
     - nltk>=3.6.0
+    - spacy>=3.0.0
     - textstat
     - difflib
+    - diff-match-patch
 
 Usage:
     from modules.text_analysis import TextAnalyzer
@@ -30,21 +32,126 @@ Usage:
     metrics = analyzer.analyze_text("Your input text here")
     readability = analyzer.get_readability_score("Your text here")
 """
-from difflib import SequenceMatcher
+from difflib import SequenceMatcher, ndiff
+try:
+    from diff_match_patch import diff_match_patch
+except ImportError:  # Fall back to difflib, which is pure Python and much slower on long texts
+    diff_match_patch = None
 import textstat
 import streamlit as st
 import os
-from typing import Dict, List, Tuple, Union 
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union 
 import logging
+import asyncio
+import functools
+import hashlib
+import itertools
 import re
+import threading
+import numpy as np
 import tiktoken
 from modules.azure_client import AzureClient
 from modules.file_handler import FileHandler
+from modules.utils import Utils, TEXT_HASH_FUNCS
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
-azure_client = AzureClient()
-client = azure_client.setup_azure_client()
+textstat.set_lang('en_US')
+
+_WORD_RE = re.compile(r"\w+")
+_SECTION_BREAK_RE = re.compile(r"\n\n")
+# Whole-text, line-anchored patterns; [^\S\n] is whitespace that cannot run onto another line
+_REF_HEADER_RE = re.compile(
+    r"(?im)^[^\S\n]*(?:references?|bibliography|citations?|works cited|sources?|references? cited)(?:[^\S\n]|:)*$")
+_CITATION_RE = re.compile(r'(?m)^[^\S\n]*(?:\[\d+\]|\d+\.|\(\d+\))[^\S\n]+')
+_SENT_END_RE = re.compile(r'[.!?]+(?:\s+|$)')
+
+# Without diff-match-patch, above this many characters highlight_differences matches lines instead of characters
+LINE_DIFF_THRESHOLD = 5000
+_REPLACE_OPEN = '<span style="background-color: #ffebee;">'
+_INSERT_OPEN = '<span style="background-color:#e8f5e9;">'
+_DELETE_OPEN = '<span style="background-color: #ffebee; text-decoration: line-through;">'
+_SPAN_CLOSE = '</span>'
+# Last enhanced text and its opcodes per original text, for incremental re-diffing of edits
+# when diff-match-patch is not installed
+_DIFF_CACHE = OrderedDict()
+# Sessions run in separate script threads, so cache reads and updates are serialized
+_DIFF_CACHE_LOCK = threading.Lock()
+DIFF_CACHE_SIZE = 8
+
+# Texts shorter than this skip the readability formulas that need several sentences
+MIN_SENTENCE_METRIC_LENGTH = 100
+
+# Documents above this many tokens are analyzed in overlapping chunks, concurrently
+AI_MAX_INPUT_TOKENS = 12000
+AI_CHUNK_TOKENS = 3000
+AI_CHUNK_OVERLAP = 200
+AI_CHUNK_SUMMARY_TOKENS = 300
+
+async def _complete_chunk(async_client, chunk: str, system_prompt: str, max_tokens: int) -> str:
+    response = await async_client.chat.completions.create(
+        model=os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": chunk}
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
+async def _complete_chunks(chunks: List[str], system_prompt: str, max_tokens: int) -> List[str]:
+    """Send the same prompt over every chunk at once and return the replies in chunk order"""
+    async_client = AzureClient().setup_async_azure_client()
+    if not async_client:
+        raise ValueError("Azure OpenAI async client not initialized")
+    async with async_client:
+        return await asyncio.gather(*(_complete_chunk(async_client, chunk, system_prompt, max_tokens) for chunk in chunks))
+
+@functools.lru_cache(maxsize=8)
+def _readability_scores(main_content: str) -> Dict[str, Union[float, str]]:
+    """
+    Raw textstat scores for a text. textstat memoizes its syllable, word and sentence counts
+    per string, so every formula below reuses the counts from the first one.
+    Callers must not mutate the returned dict, which is shared by the cache.
+    """
+    # SMOG and Linsear Write need several sentences and are meaningless on very short texts
+    long_enough = len(main_content) >= MIN_SENTENCE_METRIC_LENGTH
+    scores = {"Flesch Reading Ease": textstat.flesch_reading_ease(main_content)}
+    if long_enough:
+        scores["SMOG Index"] = textstat.smog_index(main_content)
+    scores["Gunning Fog Index"] = textstat.gunning_fog(main_content)
+    scores["Automated Readability Index"] = textstat.automated_readability_index(main_content)
+    scores["Coleman-Liau Index"] = textstat.coleman_liau_index(main_content)
+    scores["Dale-Chall Readability Score"] = textstat.dale_chall_readability_score(main_content)
+    if long_enough:
+        scores["Linsear Write Formula"] = textstat.linsear_write_formula(main_content)
+    scores["Difficult Words"] = textstat.difficult_words(main_content)
+    scores["Text Standard"] = textstat.text_standard(main_content)
+    return scores
+
+@functools.lru_cache(maxsize=8)
+def _get_encoder(model):
+    """tiktoken encoder for a model, loaded once per process"""
+    return tiktoken.encoding_for_model(model)
+
+@st.cache_resource(show_spinner=False)
+def get_sentence_pipeline():
+    """Blank English spaCy pipeline with only the tokenizer and a rule-based sentencizer"""
+    # Imported here because spaCy is the heaviest import in the app and only this pipeline needs it
+    import spacy
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    # No parser/NER components run, so long manuscripts are cheap to process
+    nlp.max_length = 10_000_000
+    return nlp
+
+@st.cache_resource(show_spinner=False)
+def get_diff_engine():
+    """Single diff_match_patch instance reused across reruns, or None when the package is missing"""
+    return diff_match_patch() if diff_match_patch is not None else None
+
 class TextAnalyzer:
     @staticmethod
     def count_tokens(text: str, model="gpt-3.5-turbo"):
@@ -58,15 +165,94 @@ class TextAnalyzer:
 
         """
         try:
-            tokenizer = tiktoken.encoding_for_model(model)
-            tokens = tokenizer.encode(text)
-            return len(tokens)
+            return len(_get_encoder(model).encode(text))
+        except Exception as e:
+            logger.error(f"An error occured when estimating number of tokens: {str(e)}")
+            return None
+
+    @staticmethod
+    def count_tokens_batch(texts: List[str], model="gpt-3.5-turbo"):
+        """
+        Counts the tokens in each of several texts, encoding them in parallel threads
+        Parameters:
+            texts (List[str]): The input texts to be tokenized
+            model (str): The model to use for selecting tokenizer
+        Returns:
+            List[int]: The number of tokens in each text
+
+        """
+        try:
+            encoded = _get_encoder(model).encode_batch(texts, num_threads=os.cpu_count() or 1)
+            return [len(tokens) for tokens in encoded]
         except Exception as e:
             logger.error(f"An error occured when estimating number of tokens: {str(e)}")
             return None
         
     @staticmethod
-    @st.cache_data(show_spinner=False)
+    def _split_long_text(text: str, model="gpt-3.5-turbo") -> List[str]:
+        """
+        Split text longer than AI_MAX_INPUT_TOKENS into overlapping windows of AI_CHUNK_TOKENS tokens
+        Args:
+            text (str): The input text to split
+            model (str): The model to use for selecting tokenizer
+
+        Returns:
+            List[str]: The text itself if it fits in one request, otherwise the chunk texts in order
+        """
+        encoder = _get_encoder(model)
+        tokens = encoder.encode(text)
+        if len(tokens) <= AI_MAX_INPUT_TOKENS:
+            return [text]
+        step = AI_CHUNK_TOKENS - AI_CHUNK_OVERLAP
+        return [encoder.decode(tokens[start:start + AI_CHUNK_TOKENS])
+                for start in range(0, len(tokens) - AI_CHUNK_OVERLAP, step)]
+
+    @staticmethod
+    @st.cache_data(max_entries=8, show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def token_counts(text: str) -> Tuple[int, int]:
+        """
+        Counts words and sentences with a tokenizer-only spaCy pipeline, cached per text
+        Args:
+            text (str): The input text to tokenize
+
+        Returns:
+            Tuple[int, int]: The number of words and the number of sentences
+        """
+        doc = get_sentence_pipeline()(text)
+        word_count = sum(1 for token in doc if not token.is_space)
+        sentence_count = sum(1 for _ in doc.sents)
+        return word_count, sentence_count
+
+    @staticmethod
+    @st.cache_data(max_entries=8, show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def section_word_counts(text: str) -> Dict[str, int]:
+        """
+        Counts the words in each blank-line separated section of the text
+        Args:
+            text (str): The input text to process
+
+        Returns:
+            Dict[str, int]: Word count keyed by "Section <n>", skipping empty sections
+        """
+        sections = text.split('\n\n')
+        # Start offset of every section, matching str.split's left-to-right separator scan
+        section_starts = np.fromiter(
+            itertools.chain([0], (m.end() for m in _SECTION_BREAK_RE.finditer(text))),
+            dtype=np.int64, count=len(sections))
+        # One scan over the whole text; words never span a blank line, so bucket them by start offset
+        word_starts = np.fromiter((m.start() for m in _WORD_RE.finditer(text)), dtype=np.int64)
+        section_ids = np.searchsorted(section_starts, word_starts, side='right') - 1
+        counts = np.bincount(section_ids, minlength=len(sections))
+
+        return {
+            f"Section {i}": int(count)
+            for i, (section, count) in enumerate(zip(sections, counts), 1)
+            if section.strip()
+        }
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    @st.cache_data(show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
     def extract_main_content(text: str) -> str:
         """
         Extract the main content of the text by removing references/citations section
@@ -76,50 +262,47 @@ class TextAnalyzer:
         Returns:
             str: Text with the citations removed
         """
-        reference_headers = [
-                r"references?$",
-                r"bibliography$",
-                r"citations?$",
-                r"works cited$",
-                r"sources?$",
-                r"references? cited$"
-            ]
-        pattern = r"(?i)^\s*(?:" + "|".join(reference_headers) + r")[\s:]*$"
-        lines = text.split("\n")
-        main_content = []
-        in_references = False
-
-        for i, line in enumerate(lines):
-            if re.match(pattern, line.strip()):
-                in_references = True
+        header = _REF_HEADER_RE.search(text)
+        cutoff = header.start() if header else None
+
+        # A run of three numbered citation lines (or one running to the end of the text) also marks the
+        # start of the references, unless it starts on the first line; only runs before the header count
+        run = []
+        next_line_start = -1
+        for match in _CITATION_RE.finditer(text):
+            start = match.start()
+            if cutoff is not None and start >= cutoff:
+                break
+            run = run + [start] if start == next_line_start else [start]
+            next_line_start = text.find("\n", start) + 1
+            if len(run) >= 3 and (run[0] > 0 or len(run) >= 4):
+                cutoff = run[0] if run[0] > 0 else run[1]
                 break
-            elif not in_references and i > 0:
-                if re.match(r'^\s*(?:\[\d+\]|\d+\.|\(\d+\))\s+', line):
-                    next_few_lines = lines[i:min(i+3, len(lines))]
-                    if all(re.match(r'^\s*(?:\[\d+\]|\d+\.|\(\d+\))\s+', l) for l in next_few_lines):
-                        in_references = True
-                        break
-            if not in_references:
-                main_content.append(line)
+        else:
+            if next_line_start == 0 and (run[0] > 0 or len(run) > 1):
+                cutoff = run[0] if run[0] > 0 else run[1]
 
-        return '\n'.join(main_content)
+        if cutoff is None:
+            return text
+        # Drop the newline that ended the last kept line
+        return text[:max(cutoff - 1, 0)]
 
     @staticmethod
-    @st.cache_data(show_spinner=False)
-    def readability_analysis(text: str) -> dict:
-        main_content = TextAnalyzer.extract_main_content(text)
+    def readability_analysis(text: str, main_content: Optional[str] = None) -> dict:
+        """
+        Readability scores of the text, annotated with a difficulty rating.
+        Pass main_content (the result of extract_main_content(text)) when it is already computed.
+        """
+        if main_content is None:
+            main_content = TextAnalyzer.extract_main_content(text)
+        return TextAnalyzer._cached_readability_analysis(main_content)
+
+    @staticmethod
+    @st.cache_data(max_entries=8, show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def _cached_readability_analysis(main_content: str) -> dict:
+        """Readability analysis cached on the main content, so it is shared by texts differing only in references"""
         try:
-            readability_scores = {
-                "Flesch Reading Ease": textstat.flesch_reading_ease(main_content),
-                "SMOG Index": textstat.smog_index(main_content),
-                "Gunning Fog Index": textstat.gunning_fog(main_content),
-                "Automated Readability Index": textstat.automated_readability_index(main_content),
-                "Coleman-Liau Index": textstat.coleman_liau_index(main_content),
-                "Dale-Chall Readability Score": textstat.dale_chall_readability_score(main_content),
-                "Linsear Write Formula": textstat.linsear_write_formula(main_content),
-                "Difficult Words": textstat.difficult_words(main_content),
-                "Text Standard": textstat.text_standard(main_content)
-            }
+            readability_scores = _readability_scores(main_content)
 
             ranges = {
                 "Flesch Reading Ease": {
@@ -187,24 +370,162 @@ class TextAnalyzer:
 
        
     @staticmethod
-    @st.cache_data(show_spinner=False)
+    def _common_affix_lengths(original: str, enhanced: str) -> Tuple[int, int]:
+        """
+        Length of the common prefix and of the common suffix (not overlapping the prefix) of two strings.
+        Binary search over slice comparisons, as in diff-match-patch, so the scan runs at C speed.
+        """
+        limit = min(len(original), len(enhanced))
+        low, high, start = 0, limit, 0
+        while low < high:
+            middle = (high - low + 1) // 2 + low
+            if original[start:middle] == enhanced[start:middle]:
+                low = start = middle
+            else:
+                high = middle - 1
+        prefix_len = low
+
+        original_end, enhanced_end = len(original), len(enhanced)
+        low, high, start = 0, limit - prefix_len, 0
+        while low < high:
+            middle = (high - low + 1) // 2 + low
+            if original[original_end - middle:original_end - start] == enhanced[enhanced_end - middle:enhanced_end - start]:
+                low = start = middle
+            else:
+                high = middle - 1
+        return prefix_len, low
+
+    @staticmethod
+    def _dmp_opcodes(dmp, original: str, enhanced: str) -> List[Tuple]:
+        """
+        SequenceMatcher-style opcodes from diff-match-patch's Myers diff, semantically cleaned up.
+        A deletion directly followed by an insertion becomes a single "replace".
+        """
+        diffs = dmp.diff_main(original, enhanced)
+        dmp.diff_cleanupSemantic(diffs)
+        opcodes = []
+        i = j = 0
+        for op, data in diffs:
+            size = len(data)
+            if op == dmp.DIFF_EQUAL:
+                opcodes.append(("equal", i, i + size, j, j + size))
+                i += size
+                j += size
+            elif op == dmp.DIFF_DELETE:
+                opcodes.append(("delete", i, i + size, j, j))
+                i += size
+            else:
+                if opcodes and opcodes[-1][0] == "delete":
+                    _, i1, i2, j1, _ = opcodes.pop()
+                    opcodes.append(("replace", i1, i2, j1, j + size))
+                else:
+                    opcodes.append(("insert", i, i, j, j + size))
+                j += size
+        return opcodes
+
+    @staticmethod
+    def _diff_opcodes(original: str, enhanced: str, original_offset: int = 0, enhanced_offset: int = 0) -> List[Tuple]:
+        """
+        SequenceMatcher-style opcodes turning `original` into `enhanced`, with positions shifted by the offsets.
+        Only the differing middle of the two texts is diffed, with diff-match-patch when it is installed.
+        """
+        prefix_len, suffix_len = TextAnalyzer._common_affix_lengths(original, enhanced)
+        original_mid = original[prefix_len:len(original) - suffix_len]
+        enhanced_mid = enhanced[prefix_len:len(enhanced) - suffix_len]
+
+        dmp = get_diff_engine()
+        if dmp is not None:
+            mid_opcodes = TextAnalyzer._dmp_opcodes(dmp, original_mid, enhanced_mid)
+        elif max(len(original_mid), len(enhanced_mid)) > LINE_DIFF_THRESHOLD:
+            # Match whole lines on long inputs, then map line indices back to character offsets
+            original_lines = original_mid.splitlines(keepends=True)
+            enhanced_lines = enhanced_mid.splitlines(keepends=True)
+            original_offsets = [0, *itertools.accumulate(map(len, original_lines))]
+            enhanced_offsets = [0, *itertools.accumulate(map(len, enhanced_lines))]
+            matcher = SequenceMatcher(None, original_lines, enhanced_lines, autojunk=False)
+            mid_opcodes = [
+                (tag, original_offsets[i1], original_offsets[i2], enhanced_offsets[j1], enhanced_offsets[j2])
+                for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+            ]
+        else:
+            mid_opcodes = SequenceMatcher(None, original_mid, enhanced_mid, autojunk=False).get_opcodes()
+
+        i_shift = original_offset + prefix_len
+        j_shift = enhanced_offset + prefix_len
+        opcodes = []
+        if prefix_len:
+            opcodes.append(("equal", original_offset, i_shift, enhanced_offset, j_shift))
+        opcodes.extend((tag, i1 + i_shift, i2 + i_shift, j1 + j_shift, j2 + j_shift)
+                       for tag, i1, i2, j1, j2 in mid_opcodes)
+        if suffix_len:
+            original_end = original_offset + len(original)
+            enhanced_end = enhanced_offset + len(enhanced)
+            opcodes.append(("equal", original_end - suffix_len, original_end, enhanced_end - suffix_len, enhanced_end))
+        return opcodes
+
+    @staticmethod
+    def _incremental_diff_opcodes(original: str, enhanced: str) -> List[Tuple]:
+        """
+        Opcodes for original -> enhanced. diff-match-patch trims the common prefix and suffix itself
+        and is fast enough to diff from scratch; with the SequenceMatcher fallback, the last diff of
+        the same original is reused when there is one. Opcodes that lie entirely in the part of the
+        text shared with the previous enhanced version are kept, and only the edited window between
+        them is diffed again.
+        """
+        if get_diff_engine() is not None:
+            return TextAnalyzer._diff_opcodes(original, enhanced)
+        with _DIFF_CACHE_LOCK:
+            cached = _DIFF_CACHE.get(original)
+        if cached is None:
+            opcodes = TextAnalyzer._diff_opcodes(original, enhanced)
+        else:
+            previous, previous_opcodes = cached
+            prefix_len, suffix_len = TextAnalyzer._common_affix_lengths(previous, enhanced)
+            delta = len(enhanced) - len(previous)
+
+            head = 0
+            while head < len(previous_opcodes) and previous_opcodes[head][4] <= prefix_len:
+                head += 1
+            tail = len(previous_opcodes)
+            while tail > head and previous_opcodes[tail - 1][3] >= len(previous) - suffix_len:
+                tail -= 1
+
+            i_start, j_start = (previous_opcodes[head - 1][2], previous_opcodes[head - 1][4]) if head else (0, 0)
+            i_end, j_end = (previous_opcodes[tail][1], previous_opcodes[tail][3] + delta) if tail < len(previous_opcodes) \
+                else (len(original), len(enhanced))
+
+            opcodes = previous_opcodes[:head]
+            opcodes.extend(TextAnalyzer._diff_opcodes(original[i_start:i_end], enhanced[j_start:j_end], i_start, j_start))
+            opcodes.extend((tag, i1, i2, j1 + delta, j2 + delta) for tag, i1, i2, j1, j2 in previous_opcodes[tail:])
+
+        with _DIFF_CACHE_LOCK:
+            _DIFF_CACHE[original] = (enhanced, opcodes)
+            _DIFF_CACHE.move_to_end(original)
+            while len(_DIFF_CACHE) > DIFF_CACHE_SIZE:
+                _DIFF_CACHE.popitem(last=False)
+        return opcodes
+
+    @staticmethod
+    @st.cache_data(show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
     def highlight_differences(original, enhanced):
+        if original == enhanced:
+            return enhanced, []
         try:
-            matcher = SequenceMatcher(None, original, enhanced)
             result = []
             changes = []
-            current_pos = 0
-            for tag, i1, i2, j1, j2, in matcher.get_opcodes():
+            for tag, i1, i2, j1, j2 in TextAnalyzer._incremental_diff_opcodes(original, enhanced):
                 if tag == "equal":
                     result.append(enhanced[j1:j2])
                 elif tag == "replace":
-                    result.append(f'<span style="background-color: #ffebee;">{enhanced[j1:j2]}</span>')
-                    changes.append(["replace", j1, enhanced[j1:j2]])
+                    segment = enhanced[j1:j2]
+                    result.extend((_REPLACE_OPEN, segment, _SPAN_CLOSE))
+                    changes.append(["replace", j1, segment])
                 elif tag == "insert":
-                    result.append(f'<span style="background-color:#e8f5e9;">{enhanced[j1:j2]}</span>')
-                    changes.append(["insert", j1, enhanced[j1:j2]])
+                    segment = enhanced[j1:j2]
+                    result.extend((_INSERT_OPEN, segment, _SPAN_CLOSE))
+                    changes.append(["insert", j1, segment])
                 elif tag == "delete":
-                    result.append(f'<span style="background-color: #ffebee; text-decoration: line-through;">{original[i1:i2]}</span>')
+                    result.extend((_DELETE_OPEN, original[i1:i2], _SPAN_CLOSE))
 
             return "".join(result), changes
         except Exception as e:
@@ -212,30 +533,70 @@ class TextAnalyzer:
             return enhanced, []
     
     @staticmethod
-    @st.cache_data(show_spinner=False)
-    def syntax_analysis(text):
+    def line_diff(original: str, enhanced: str) -> str:
+        """
+        Line-level diff of two texts rendered in `diff` notation ("- ", "+ " and "  " prefixes)
+        Args:
+            original (str): The original text
+            enhanced (str): The edited text
+
+        Returns:
+            str: One prefixed line per removed, added or unchanged line
+        """
+        dmp = get_diff_engine()
+        if dmp is None:
+            return "\n".join(line for line in ndiff(original.splitlines(), enhanced.splitlines())
+                             if not line.startswith("? "))
+        # Encode each line as a single character so the diff runs at line granularity;
+        # diff_main trims the common prefix/suffix before diffing the middle.
+        original_chars, enhanced_chars, line_array = dmp.diff_linesToChars(original, enhanced)
+        diffs = dmp.diff_main(original_chars, enhanced_chars, False)
+        dmp.diff_cleanupSemantic(diffs)
+        dmp.diff_charsToLines(diffs, line_array)
+
+        prefixes = {dmp.DIFF_EQUAL: "  ", dmp.DIFF_DELETE: "- ", dmp.DIFF_INSERT: "+ "}
+        return "\n".join(prefixes[op] + line for op, data in diffs for line in data.splitlines())
+
+    @staticmethod
+    def syntax_analysis(text, main_content=None):
         """
         Performs a basic syntax analysis on the given text, checking for common issues like 
         sentence length and punctuation balance.
 
         Args:
             text (str): The text to analyze.
+            main_content (str, optional): extract_main_content(text), if it is already computed.
 
         Returns:
             dict: A dictionary with syntax analysis results, such as average sentence length and
                 whether the text has balanced punctuation.
         """
-        main_content = TextAnalyzer.extract_main_content(text)
-        # Split text into sentences
-        sentences = main_content.split(". ")
-        num_sentences = len(sentences)
-        total_words = len(main_content.split())
+        if main_content is None:
+            main_content = TextAnalyzer.extract_main_content(text)
+        return TextAnalyzer._cached_syntax_analysis(main_content)
+
+    @staticmethod
+    @st.cache_data(show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def _cached_syntax_analysis(main_content):
+        """Syntax analysis of the main content of a text, cached on that content"""
+        # Count sentence terminators, plus any trailing sentence without one
+        num_sentences = 0
+        last_end = 0
+        for match in _SENT_END_RE.finditer(main_content):
+            num_sentences += 1
+            last_end = match.end()
+        if main_content[last_end:].strip():
+            num_sentences += 1
+        total_words = sum(1 for _ in _WORD_RE.finditer(main_content))
         average_sentence_length = total_words / num_sentences if num_sentences > 0 else 0
 
-        # Check for balanced punctuation (e.g., matching parentheses, quotes)
+        # Check for balanced punctuation (e.g., matching parentheses, quotes) in one vectorized
+        # byte scan; the characters are ASCII so UTF-8 byte counts equal character counts
+        byte_counts = np.bincount(
+            np.frombuffer(main_content.encode('utf-8', 'ignore'), dtype=np.uint8), minlength=256)
         punctuation_balance = {
-            "Parentheses Balanced": main_content.count("(") == main_content.count(")"),
-            "Quotes Balanced": main_content.count("\"") % 2 == 0
+            "Parentheses Balanced": bool(byte_counts[ord("(")] == byte_counts[ord(")")]),
+            "Quotes Balanced": int(byte_counts[ord('"')]) % 2 == 0
         }
 
         syntax_results = {
@@ -245,13 +606,20 @@ class TextAnalyzer:
         return syntax_results
     
     @staticmethod
-    @st.cache_data(show_spinner=False)
-    def generate_elevator_pitch(_client, text, summary_length="short"):
+    def generate_elevator_pitch(client, text, summary_length="short", main_content=None):
         """
         Make summaries of document. Three options: short, medium, and detailed
+        Pass main_content (the result of extract_main_content(text)) when it is already computed.
         """
-        main_content = TextAnalyzer.extract_main_content(text)
-        if not client:
+        if main_content is None:
+            main_content = TextAnalyzer.extract_main_content(text)
+        return TextAnalyzer._cached_elevator_pitch(client, main_content, summary_length)
+
+    @staticmethod
+    @st.cache_data(show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def _cached_elevator_pitch(_client, main_content, summary_length):
+        """Summary of the main content of a document, cached on that content and the summary length"""
+        if not _client:
             return "AI Summarization currently unavailable. Please try later!"
         summary_config = {
                 "short": {
@@ -269,7 +637,16 @@ class TextAnalyzer:
             }
         config = summary_config.get(summary_length.lower(), summary_config["short"])
         try:
-            response = client.chat.completions.create(
+            chunks = TextAnalyzer._split_long_text(main_content)
+            if len(chunks) > 1:
+                # Summarize sections concurrently, then summarize the section summaries below
+                partial_summaries = Utils.run_async(_complete_chunks(
+                    chunks,
+                    "You are an epidemiologist. Summarize this section of a longer manuscript.",
+                    AI_CHUNK_SUMMARY_TOKENS
+                ))
+                main_content = "\n\n".join(partial_summaries)
+            response = _client.chat.completions.create(
                     model=os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
                     messages=[
         
@@ -284,20 +661,40 @@ class TextAnalyzer:
             logger.error(f"Failed in generating document summary. {str(e)}")
             return "Failed to generate document summary. Please try again later."
         
+    @staticmethod
+    def analyze_text_ai(client, text, max_words = None, regenerate_counter = 0, main_content = None):
+        """
+        Analyze text using Azure OpenAI with error handling and word limits to conserve computing resources.
+        Results are cached per main content; bump regenerate_counter to request a fresh analysis.
+        Pass main_content (the result of extract_main_content(text)) when it is already computed.
+        """
+        if main_content is None:
+            main_content = TextAnalyzer.extract_main_content(text)
+        content_hash = hashlib.sha1(main_content.encode()).hexdigest()
+        return TextAnalyzer._cached_analyze_text_ai(client, main_content, content_hash, max_words, regenerate_counter)
+
     @staticmethod
     @st.cache_data(show_spinner=False)
-    def analyze_text_ai(_client, text, max_words = None):
-        """Analyze text using Azure OpenAI with error handling and word limits to conserve computing resources"""
-        if not client:
+    def _cached_analyze_text_ai(_client, _main_content, content_hash, max_words, regenerate_counter):
+        """Cached AI analysis keyed on the main content hash, word limit and regenerate counter"""
+        if not _client:
             return "AI analysis is currently unavailable. Please try again later."
 
-        main_content = TextAnalyzer.extract_main_content(text)
+        main_content = _main_content
         try:
             max_tokens = int(max_words * 1.3) if max_words else 8000
-            response = client.chat.completions.create(
+            system_prompt = "You are a professional epidemiological journal editor. Analyze the following text and suggest improvements."
+            chunks = TextAnalyzer._split_long_text(main_content)
+            if len(chunks) > 1:
+                # Analyze sections concurrently, then merge the partial analyses below
+                partial_analyses = Utils.run_async(_complete_chunks(chunks, system_prompt, max(max_tokens // len(chunks), 1)))
+                main_content = "\n\n".join(partial_analyses)
+                system_prompt = ("You are a professional epidemiological journal editor. The following are your suggested "
+                                 "improvements for consecutive sections of one manuscript. Merge them into a single coherent response.")
+            response = _client.chat.completions.create(
                 model=os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
                 messages=[
-                    {"role": "system", "content": "You are a professional epidemiological journal editor. Analyze the following text and suggest improvements."},
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": main_content}
                 ],
                 temperature=0.7,
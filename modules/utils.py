@@ -16,6 +16,7 @@ Functions:
     - Common text processing utilities
     - Error handling and validation
     - Configuration management
+    - Cheap cache keys for large texts
 
 Dependencies:
     - nltk>=3.6.0
@@ -29,25 +30,66 @@ Usage:
     download_nltk_resources()
 """
 import nltk
+import asyncio
+import hashlib
 import logging
 import streamlit as st
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# Strings longer than this are keyed in st.cache_data by a BLAKE2b fingerprint instead of their full contents
+FINGERPRINT_MIN_LENGTH = 10000
+
 class Utils:
+    @staticmethod
+    def ensure_nltk_data(resource_path: str, package: str) -> bool:
+        """Download an NLTK package only if it is not already installed; returns whether it is available"""
+        try:
+            nltk.data.find(resource_path)
+            return True
+        except LookupError:
+            pass
+        try:
+            if nltk.download(package, quiet=True):
+                return True
+            logger.error(f"Failed to download NLTK package: {package}")
+        except Exception as e:
+            logger.error(f"Failed to download NLTK data: {str(e)}")
+        return False
+
     @staticmethod
     @st.cache_resource
     def download_nltk_data():
-        """Downloads requires the NLTK library """
+        """Downloads the NLTK data the app uses (English stopwords; sentences are split with spaCy)"""
+        if not Utils.ensure_nltk_data('corpora/stopwords', 'stopwords'):
+            st.warning("Some text analysis features may be limited due to resource download issues.")
+
+    @staticmethod
+    def text_fingerprint(text: str):
+        """
+        Cheap cache key for a string: long texts (e.g. whole manuscripts) hash to a 16-byte BLAKE2b digest,
+        short ones to their UTF-8 bytes. Never returns the string itself: Streamlit's hasher would see
+        the same object already on its stack and hash every string to one cycle placeholder.
+        """
+        data = text.encode('utf-8', 'surrogatepass')
+        if len(text) > FINGERPRINT_MIN_LENGTH:
+            return hashlib.blake2b(data, digest_size=16).digest()
+        return data
+
+    @staticmethod
+    def run_async(coroutine):
+        """
+        Run a coroutine (e.g. an asyncio.gather of LLM requests) to completion from the Streamlit script thread.
+        Falls back to nest_asyncio when the thread already has a running event loop.
+        """
         try:
-            nltk.data.find('tokenizers/punkt')
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            try:
-                nltk.download('punkt')
-                nltk.download('stopwords')
-            except Exception as e:
-                logger.error(f"Failed to download NLTK data: {str(e)}")
-                st.warning("Some text analysis features may be limited due to resource download issues.")
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        import nest_asyncio
+        nest_asyncio.apply()
+        return asyncio.get_event_loop().run_until_complete(coroutine)
 
+# hash_funcs for st.cache_data functions that take whole documents as arguments
+TEXT_HASH_FUNCS = {str: Utils.text_fingerprint}
@@ -30,18 +30,63 @@ Usage:
     wordcloud = viz.generate_wordcloud("Your text here")
     freq_plot = viz.plot_frequency_distribution(tokens)
 """
-import matplotlib.pyplot as plt 
-from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
+# matplotlib, wordcloud, numpy and PIL are imported inside the functions that draw, so the
+# app's first render does not wait on them
 import streamlit as st
 import logging 
-import numpy as np
-from PIL import Image
+import functools
+import io
+import re
+from collections import Counter
+from modules.nlp_resources import STOP_EN_FROZEN
+from modules.utils import TEXT_HASH_FUNCS
 
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# Same token pattern WordCloud.generate uses by default
+_CLOUD_WORD_RE = re.compile(r"\w[\w']+")
+# WordCloud only draws this many of the most frequent words, so counts are trimmed to it
+WORD_CLOUD_MAX_WORDS = 200
+
+@functools.lru_cache(maxsize=1)
+def _wordcloud_stopwords():
+    """WordCloud's built-in stopword list, frozen once so it can key the frequency cache"""
+    from wordcloud import STOPWORDS
+    return frozenset(STOPWORDS)
+
+@st.cache_resource(show_spinner=False)
+def _load_mask(image_path):
+    """Decoded word cloud mask image, loaded once per path"""
+    import numpy as np
+    from PIL import Image
+    return np.array(Image.open(image_path))
+
 class Visualizer:
+    @staticmethod
+    @st.cache_data(max_entries=8, show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def word_frequencies(text, stopwords):
+        """
+        Counts lower-cased words in the text for the word cloud, excluding stopwords and numbers.
+
+        Args:
+            text (str): The full text to count words in.
+            stopwords (frozenset): Words to leave out.
+
+        Returns:
+            dict: The WORD_CLOUD_MAX_WORDS most frequent words and their counts.
+        """
+        # Like WordCloud.process_text: drop possessive 's and numbers before counting
+        counts = Counter(
+            word for word in (
+                (match[:-2] if match.endswith(("'s", "'S")) else match).lower()
+                for match in _CLOUD_WORD_RE.findall(text)
+            )
+            if word not in stopwords and not word.isdigit()
+        )
+        return dict(counts.most_common(WORD_CLOUD_MAX_WORDS))
+
     @staticmethod
     @st.cache_data
     def plot_word_count_distribution(word_counts):
@@ -55,6 +100,7 @@ class Visualizer:
             None: The function displays the plot using Streamlit.
         """
         try:
+            import matplotlib.pyplot as plt
             plt.figure(figsize=(10, 5))
             plt.bar(word_counts.keys(), word_counts.values())
             plt.title("Section Word Count Distribution")
@@ -66,7 +112,30 @@ class Visualizer:
             st.error("Failed to generate word count visualization.")
 
     @staticmethod
-    @st.cache_data
+    @st.cache_data(max_entries=4, show_spinner=False, hash_funcs=TEXT_HASH_FUNCS)
+    def word_cloud_png(text):
+        """
+        Renders a word cloud of the text, excluding NLTK English stopwords, to PNG bytes.
+
+        Args:
+            text (str): The full text to generate the word cloud from.
+
+        Returns:
+            bytes: The PNG encoded word cloud image, ready for st.image.
+        """
+        from wordcloud import WordCloud
+        wordcloud = WordCloud(
+            width=800,
+            height=400,
+            background_color='white',
+            max_words=WORD_CLOUD_MAX_WORDS
+        ).generate_from_frequencies(Visualizer.word_frequencies(text, STOP_EN_FROZEN))
+        png_io = io.BytesIO()
+        wordcloud.to_image().save(png_io, format="PNG")
+        return png_io.getvalue()
+
+    @staticmethod
+    @st.cache_data(hash_funcs=TEXT_HASH_FUNCS)
     def generate_word_cloud(text, image_path=None):
         """
         Generates and displays a word cloud from the input text, with an optional image mask for shaping the cloud.
@@ -79,17 +148,20 @@ class Visualizer:
             None: The function displays the word cloud using Streamlit.
         """
         try:
-            wordcloud = WordCloud(stopwords=STOPWORDS, background_color="white", width=800, height=400)
+            import matplotlib.pyplot as plt
+            from wordcloud import WordCloud, ImageColorGenerator
+            frequencies = Visualizer.word_frequencies(text, _wordcloud_stopwords())
 
             if image_path:
-                mask = np.array(Image.open(image_path))
-                wordcloud = WordCloud(stopwords=STOPWORDS, background_color="white", mask=mask)
+                mask = _load_mask(image_path)
+                wordcloud = WordCloud(background_color="white", mask=mask, max_words=WORD_CLOUD_MAX_WORDS)
                 image_colors = ImageColorGenerator(mask)
-                wordcloud.generate(text)
+                wordcloud.generate_from_frequencies(frequencies)
                 plt.figure(figsize=(10, 5))
                 plt.imshow(wordcloud.recolor(color_func=image_colors), interpolation="bilinear")
             else:
-                wordcloud.generate(text)
+                wordcloud = WordCloud(background_color="white", width=800, height=400, max_words=WORD_CLOUD_MAX_WORDS)
+                wordcloud.generate_from_frequencies(frequencies)
                 plt.figure(figsize=(10, 5))
                 plt.imshow(wordcloud, interpolation="bilinear")
 